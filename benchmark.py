@@ -0,0 +1,975 @@
+"""
+===============================================================================
+EMAIL AUTOMATION - END-TO-END REPLAY BENCHMARK
+===============================================================================
+
+Replays a synthetic inbox through process_incoming_emails() without touching
+any live Google API:
+
+1. Synthetic corpus generator (spam / meeting / invite / attachment mix
+   and sizes)
+2. In-process fake Gmail, Calendar and Gemini services with configurable
+   latency and error injection
+3. Scripted answer provider for the operator prompts
+4. Throughput, per-stage latency percentiles, peak memory, API call counts
+   and bytes transferred, written to JSON for comparison across commits
+
+Usage:
+    python benchmark.py --emails 200 --gemini-latency-ms 400 -o before.json
+    python benchmark.py --emails 200 --gemini-latency-ms 400 -o after.json \\
+        --compare before.json
+===============================================================================
+"""
+
+import argparse
+import base64
+import contextlib
+import io
+import json
+import math
+import platform
+import random
+import re
+import subprocess
+import threading
+import time
+import tracemalloc
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+from email.mime.application import MIMEApplication
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+
+import email_automation
+
+
+# ============================================
+# SYNTHETIC CORPUS
+# ============================================
+
+FILLER_WORDS = (
+    "lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod "
+    "tempor incididunt ut labore et dolore magna aliqua ut enim ad minim "
+    "veniam quis nostrud exercitation ullamco laboris nisi aliquip ex ea "
+    "commodo consequat"
+).split()
+
+SPAM_SENDERS = [
+    "Deals <deals@shop-mailers.com>",
+    "Rewards <noreply@rewards-club.com>",
+    "Offers <recommendations@store.com>",
+]
+
+PROFESSIONAL_SENDERS = [
+    "Sarah Lee <sarah@company.com>",
+    "Project Office <pmo@corp.org>",
+    "Dr. Rao <rao@university.edu>",
+]
+
+PERSONAL_SENDERS = [
+    "Mom <mom@gmail.com>",
+    "Alex <alex.friend@gmail.com>",
+    "Priya <priya@yahoo.com>",
+]
+
+SPAM_TEMPLATES = [
+    ("Congratulations, you win a FREE prize!",
+     "Claim now! Click here to grab your offer. Limited time exclusive deal."),
+    ("Save up to 70% - shop now",
+     "Exclusive deal on all items. Limited time discount, click here to unsubscribe."),
+]
+
+MEETING_TEMPLATES = [
+    ("Quick sync tomorrow?",
+     "Can we have a quick meeting tomorrow at 10 AM to discuss the project agenda?"),
+    ("Interview schedule",
+     "Please join the zoom call tomorrow for the interview session with the team."),
+]
+
+PROFESSIONAL_TEMPLATES = [
+    ("Quarterly report draft",
+     "Please review the attached report before the deadline and share comments with the team."),
+    ("Proposal for client",
+     "The client proposal needs a final pass on the business section this week."),
+]
+
+PERSONAL_TEMPLATES = [
+    ("Dinner this weekend",
+     "How are you? We should have dinner this weekend with the family."),
+    ("Birthday party",
+     "Miss you! Come to the birthday party on Saturday, bring a friend."),
+]
+
+
+def _filler(rng, size):
+    """Produce roughly `size` characters of neutral filler text"""
+    words = []
+    length = 0
+    while length < size:
+        word = rng.choice(FILLER_WORDS)
+        words.append(word)
+        length += len(word) + 1
+    return " ".join(words)
+
+
+def _invite_ics(rng, seed, uid_pool, sequences, summary, organizer):
+    """
+    A REQUEST VEVENT as Outlook/Google Calendar would attach it.
+
+    `sequences` counts invites per UID; a repeated UID is a reschedule
+    with the next SEQUENCE number.
+    """
+    start = datetime(2025, 11, 3, 9, 0) + timedelta(days=rng.randrange(60),
+                                                    minutes=30 * rng.randrange(16))
+    end = start + timedelta(minutes=rng.choice([30, 45, 60, 90]))
+    uid = f"bench-{seed}-{rng.randrange(uid_pool)}@example.com"
+    sequence = sequences.get(uid, -1) + 1
+    sequences[uid] = sequence
+    name, address = organizer.rstrip(">").split(" <")
+    lines = [
+        "BEGIN:VCALENDAR",
+        "PRODID:-//Benchmark//Invite//EN",
+        "VERSION:2.0",
+        "METHOD:REQUEST",
+        "BEGIN:VTIMEZONE",
+        "TZID:Asia/Kolkata",
+        "BEGIN:STANDARD",
+        "DTSTART:19700101T000000",
+        "TZOFFSETFROM:+0530",
+        "TZOFFSETTO:+0530",
+        "END:STANDARD",
+        "END:VTIMEZONE",
+        "BEGIN:VEVENT",
+        f'ORGANIZER;CN="{name}":mailto:{address}',
+        f"DTSTART;TZID=Asia/Kolkata:{start:%Y%m%dT%H%M%S}",
+        f"DTEND;TZID=Asia/Kolkata:{end:%Y%m%dT%H%M%S}",
+        f"UID:{uid}",
+        f"SEQUENCE:{sequence}",
+        f"SUMMARY:{summary}",
+        # Long property folded per RFC 5545
+        "DESCRIPTION:" + _filler(rng, 60) + "\r\n " + _filler(rng, 60),
+        "BEGIN:VALARM",
+        "TRIGGER:-PT15M",
+        "ACTION:DISPLAY",
+        "END:VALARM",
+        "END:VEVENT",
+        "END:VCALENDAR",
+    ]
+    return "\r\n".join(lines) + "\r\n"
+
+
+def _mime_structure(part):
+    """MIME types of a message and its parts, as in Gmail's payload"""
+    structure = {"mimeType": part.get_content_type()}
+    if part.is_multipart():
+        structure["parts"] = [_mime_structure(sub) for sub in part.get_payload()]
+    return structure
+
+
+def generate_corpus(count=100, spam_ratio=0.3, meeting_ratio=0.2,
+                    attachment_ratio=0.1, body_chars=1500, attachment_kb=64,
+                    invite_ratio=0.0, seed=42):
+    """
+    Generate a deterministic synthetic inbox
+
+    `invite_ratio` is the fraction of meeting emails that carry a
+    text/calendar invite part; invite UIDs are drawn from a pool smaller
+    than the number of invites, so some arrive more than once.
+
+    Three quarters of the spam sits in the Promotions tab, everything else
+    in Primary; receive dates spread over the last 30 days.
+
+    Returns a list of Gmail-style message resources ("id", "threadId",
+    "labelIds", "snippet", "sizeEstimate", "internalDate", "payload",
+    "raw").
+    """
+    rng = random.Random(seed)
+    # Separate stream so invite_ratio does not change the rest of the corpus
+    invite_rng = random.Random(f"{seed}-invites")
+    corpus = []
+    uid_pool = max(1, int(count * meeting_ratio * invite_ratio * 0.8))
+    sequences = {}
+    now = datetime.now()
+
+    for idx in range(count):
+        invite = None
+        tab = "CATEGORY_PERSONAL"
+        roll = rng.random()
+        if roll < spam_ratio:
+            if idx % 4:
+                tab = "CATEGORY_PROMOTIONS"
+            sender = rng.choice(SPAM_SENDERS)
+            subject, text = rng.choice(SPAM_TEMPLATES)
+        elif roll < spam_ratio + meeting_ratio:
+            sender = rng.choice(PROFESSIONAL_SENDERS)
+            subject, text = rng.choice(MEETING_TEMPLATES)
+            if invite_ratio > 0 and invite_rng.random() < invite_ratio:
+                invite = _invite_ics(invite_rng, seed, uid_pool, sequences, subject, sender)
+        elif rng.random() < 0.5:
+            sender = rng.choice(PROFESSIONAL_SENDERS)
+            subject, text = rng.choice(PROFESSIONAL_TEMPLATES)
+        else:
+            sender = rng.choice(PERSONAL_SENDERS)
+            subject, text = rng.choice(PERSONAL_TEMPLATES)
+
+        body = f"{text}\n\n{_filler(rng, max(0, body_chars - len(text)))}"
+
+        if invite:
+            content = MIMEMultipart("alternative")
+            content.attach(MIMEText(body))
+            content.attach(MIMEText(invite, "calendar"))
+            content.get_payload()[1].set_param("method", "REQUEST")
+        else:
+            content = MIMEText(body)
+
+        if rng.random() < attachment_ratio:
+            mime = MIMEMultipart()
+            mime.attach(content)
+            attachment = MIMEApplication(rng.randbytes(attachment_kb * 1024))
+            attachment.add_header("Content-Disposition", "attachment",
+                                  filename=f"file-{idx}.bin")
+            mime.attach(attachment)
+        else:
+            mime = content
+
+        mime["From"] = sender
+        mime["To"] = "me@example.com"
+        mime["Subject"] = subject
+        mime["Message-ID"] = f"<bench-{seed}-{idx}@example.com>"
+
+        raw = mime.as_bytes()
+        received = now - timedelta(days=idx % 30, minutes=idx)
+        corpus.append({
+            "id": f"msg{idx:06d}",
+            "threadId": f"thr{idx:06d}",
+            "labelIds": ["UNREAD", "INBOX", tab],
+            "snippet": text[:100],
+            "sizeEstimate": len(raw),
+            "internalDate": str(int(received.timestamp() * 1000)),
+            "payload": dict(
+                _mime_structure(mime),
+                headers=[{"name": k, "value": v} for k, v in mime.items()],
+            ),
+            "raw": base64.urlsafe_b64encode(raw).decode("ascii"),
+        })
+
+    return corpus
+
+
+# ============================================
+# FAKE SERVICES
+# ============================================
+
+class FakeApiError(Exception):
+    """Injected failure raised by a fake service"""
+
+
+class FakeBackend:
+    """Shared latency, error injection and accounting for fake services"""
+
+    def __init__(self, name, latency_ms=0.0, jitter=0.0, error_rate=0.0,
+                 seed=0, stats=None, slow_rate=0.0, slow_ms=0.0):
+        self.name = name
+        self.latency_ms = latency_ms
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.slow_rate = slow_rate
+        self.slow_ms = slow_ms
+        self.rng = random.Random(seed)
+        self.stats = stats if stats is not None else BenchmarkStats()
+
+    def call(self, operation, handler):
+        """Simulate one API round trip and account for it"""
+        with self.stats.lock:
+            delay = self.latency_ms * (1 + self.rng.uniform(-self.jitter, self.jitter))
+            if self.rng.random() < self.slow_rate:
+                delay = self.slow_ms
+            failed = self.rng.random() < self.error_rate
+
+        if delay > 0:
+            time.sleep(delay / 1000.0)
+
+        key = f"{self.name}.{operation}"
+        self.stats.count_call(key)
+
+        if failed:
+            self.stats.count_error(key)
+            raise FakeApiError(f"{key}: injected 503 Service Unavailable")
+
+        response = handler()
+        self.stats.count_bytes(key, len(json.dumps(response)))
+        return response
+
+
+class _FakeRequest:
+    """Mimics a googleapiclient HttpRequest"""
+
+    def __init__(self, backend, operation, handler):
+        self._backend = backend
+        self._operation = operation
+        self._handler = handler
+
+    def execute(self):
+        return self._backend.call(self._operation, self._handler)
+
+
+def _split_top_level(spec):
+    parts, depth, start = [], 0, 0
+    for pos, char in enumerate(spec):
+        if char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        elif char == "," and depth == 0:
+            parts.append(spec[start:pos])
+            start = pos + 1
+    parts.append(spec[start:])
+    return [p.strip() for p in parts if p.strip()]
+
+
+def parse_fields(spec):
+    """Parse a partial-response `fields` spec into {name: subtree or None}"""
+    tree = {}
+    for item in _split_top_level(spec):
+        paren = item.find("(")
+        slash = item.find("/")
+        if paren != -1 and (slash == -1 or paren < slash) and item.endswith(")"):
+            name, subtree = item[:paren], parse_fields(item[paren + 1:-1])
+        elif slash != -1:
+            name, subtree = item[:slash], parse_fields(item[slash + 1:])
+        else:
+            name, subtree = item, None
+        if subtree is None or (name in tree and tree[name] is None):
+            tree[name] = None
+        else:
+            tree.setdefault(name, {}).update(subtree)
+    return tree
+
+
+def select_fields(resource, tree):
+    """Apply a parsed `fields` tree to a response, as the Google APIs do"""
+    if tree is None:
+        return resource
+    if isinstance(resource, list):
+        return [select_fields(item, tree) for item in resource]
+    if isinstance(resource, dict):
+        return {k: select_fields(resource[k], sub) for k, sub in tree.items() if k in resource}
+    return resource
+
+
+SEARCH_TERM = re.compile(r'-?[\w.]+:\([^)]*\)|\S+')
+NEWER_THAN = re.compile(r'^(\d+)([dmy])$')
+
+
+class FakeGmailService:
+    """
+    In-process stand-in for the Gmail v1 service
+
+    Supports the search operators the workflow emits (is:unread,
+    newer_than:, [-]category:, [-]from:), the raw/metadata/full formats
+    and `fields` partial responses.
+    """
+
+    def __init__(self, corpus, backend):
+        self.backend = backend
+        self.messages_by_id = {m["id"]: m for m in corpus}
+        self.order = [m["id"] for m in corpus]
+        self.sent = []
+
+    def users(self):
+        return self
+
+    def messages(self):
+        return self
+
+    def _matches(self, message, term):
+        negate = term.startswith("-")
+        key, _, value = term.lstrip("-").partition(":")
+        value = value.strip("()").lower()
+
+        if key == "is" and value == "unread":
+            result = "UNREAD" in message["labelIds"]
+        elif key == "category":
+            result = f"CATEGORY_{value.upper()}" in message["labelIds"]
+        elif key == "from":
+            sender = next((h["value"] for h in message["payload"]["headers"]
+                           if h["name"].lower() == "from"), "").lower()
+            result = any(address.strip() in sender for address in value.split(" or "))
+        elif key == "newer_than":
+            amount, unit = NEWER_THAN.match(value).groups()
+            days = int(amount) * {"d": 1, "m": 31, "y": 365}[unit]
+            cutoff = (datetime.now() - timedelta(days=days)).timestamp() * 1000
+            result = int(message["internalDate"]) >= cutoff
+        else:
+            raise ValueError(f"Unsupported search term in fake Gmail: {term!r}")
+        return result != negate
+
+    def list(self, userId="me", q=None, maxResults=100, fields=None, **kwargs):
+        def handler():
+            terms = SEARCH_TERM.findall(q or "")
+            ids = [i for i in self.order
+                   if all(self._matches(self.messages_by_id[i], t) for t in terms)]
+            ids = ids[:maxResults]
+            response = {
+                "messages": [
+                    {"id": i, "threadId": self.messages_by_id[i]["threadId"]}
+                    for i in ids
+                ],
+                "resultSizeEstimate": len(ids),
+            }
+            return select_fields(response, parse_fields(fields)) if fields else response
+        return _FakeRequest(self.backend, "list", handler)
+
+    def get(self, userId="me", id=None, format="full", metadataHeaders=None,
+            fields=None, **kwargs):
+        def handler():
+            message = self.messages_by_id[id]
+            if format == "raw":
+                response = {k: v for k, v in message.items() if k != "payload"}
+            else:
+                response = {k: v for k, v in message.items() if k != "raw"}
+                if format == "metadata" and metadataHeaders:
+                    wanted = {h.lower() for h in metadataHeaders}
+                    response["payload"] = dict(message["payload"], headers=[
+                        h for h in message["payload"]["headers"] if h["name"].lower() in wanted
+                    ])
+            return select_fields(response, parse_fields(fields)) if fields else response
+        return _FakeRequest(self.backend, f"get.{format}", handler)
+
+    def send(self, userId="me", body=None):
+        def handler():
+            self.sent.append(body)
+            return {"id": f"sent{len(self.sent):06d}", "labelIds": ["SENT"]}
+        return _FakeRequest(self.backend, "send", handler)
+
+
+class FakeCalendarService:
+    """In-process stand-in for the Calendar v3 service"""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.inserted = []
+        self.patched = []
+        self.by_id = {}
+        self.by_ical_uid = {}
+
+    def events(self):
+        return self
+
+    def list(self, calendarId="primary", iCalUID=None, **kwargs):
+        def handler():
+            event = self.by_ical_uid.get(iCalUID)
+            return {"items": [event] if event else []}
+        return _FakeRequest(self.backend, "list", handler)
+
+    def insert(self, calendarId="primary", body=None, **kwargs):
+        def handler():
+            self.inserted.append(body)
+            event_id = f"evt{len(self.inserted):06d}"
+            event = dict(
+                body,
+                id=event_id,
+                htmlLink=f"https://calendar.example.com/event?eid={event_id}",
+            )
+            self.by_id[event_id] = event
+            if body.get("iCalUID"):
+                self.by_ical_uid[body["iCalUID"]] = event
+            return event
+        return _FakeRequest(self.backend, "insert", handler)
+
+    def patch(self, calendarId="primary", eventId=None, body=None, **kwargs):
+        def handler():
+            event = self.by_id[eventId]
+            for key, value in body.items():
+                if isinstance(value, dict):
+                    merged = dict(event.get(key, {}), **value)
+                    event[key] = {k: v for k, v in merged.items() if v is not None}
+                else:
+                    event[key] = value
+            self.patched.append(eventId)
+            return event
+        return _FakeRequest(self.backend, "patch", handler)
+
+
+class _FakeGeminiResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class _FakeGenerativeModel:
+    def __init__(self, fake, model_name):
+        self._fake = fake
+        self.model_name = model_name
+
+    def generate_content(self, prompt, **kwargs):
+        text = ("Thanks for your note. I have gone through the details and "
+                "will follow up with a complete answer shortly.")
+        response = self._fake.backend.call(
+            "generate_content",
+            lambda: {"text": text, "prompt_chars": len(prompt)}
+        )
+        return _FakeGeminiResponse(response["text"])
+
+
+class FakeGemini:
+    """Drop-in replacement for the `google.generativeai` module"""
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    def configure(self, api_key=None, **kwargs):
+        pass
+
+    def GenerativeModel(self, model_name, **kwargs):
+        return _FakeGenerativeModel(self, model_name)
+
+
+# ============================================
+# SCRIPTED OPERATOR
+# ============================================
+
+DEFAULT_ANSWERS = [
+    ("Add to calendar?", "yes"),
+    ("Generate AI reply?", "yes"),
+    ("Select (1-5)", "2"),
+    ("Formality", "0.5"),
+    ("What should the reply say?", "thank them and confirm"),
+    ("Send this reply?", "yes"),
+    ("Send the Gemini reply instead?", "yes"),
+]
+
+
+class ScriptedAnswers:
+    """
+    Non-interactive replacement for input()
+
+    Answers are matched by prompt substring. The time between handing back
+    an answer and being asked the next question is recorded as operator
+    wait - the latency the operator actually perceives.
+    """
+
+    def __init__(self, answers=None, think_ms=0.0, stats=None):
+        self.answers = list(answers or DEFAULT_ANSWERS)
+        self.think_ms = think_ms
+        self.stats = stats if stats is not None else BenchmarkStats()
+        self._last_answer_at = None
+
+    def __call__(self, prompt=""):
+        now = time.perf_counter()
+        if self._last_answer_at is not None:
+            self.stats.record("operator_wait", now - self._last_answer_at)
+
+        for needle, answer in self.answers:
+            if needle in prompt:
+                break
+        else:
+            raise KeyError(f"No scripted answer for prompt: {prompt!r}")
+
+        if self.think_ms > 0:
+            time.sleep(self.think_ms / 1000.0)
+
+        self.stats.count_call(f"operator.{needle}")
+        self._last_answer_at = time.perf_counter()
+        return answer
+
+
+# ============================================
+# METRICS
+# ============================================
+
+class BenchmarkStats:
+    """Thread-safe collector for stage timings and API accounting"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.timings = defaultdict(list)
+        self.calls = Counter()
+        self.errors = Counter()
+        self.bytes = Counter()
+
+    def record(self, stage, seconds):
+        with self.lock:
+            self.timings[stage].append(seconds)
+
+    def count_call(self, key):
+        with self.lock:
+            self.calls[key] += 1
+
+    def count_error(self, key):
+        with self.lock:
+            self.errors[key] += 1
+
+    def count_bytes(self, key, size):
+        with self.lock:
+            self.bytes[key] += size
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = math.ceil(pct / 100.0 * len(sorted_values)) - 1
+    return sorted_values[max(0, min(rank, len(sorted_values) - 1))]
+
+
+def summarize_timings(values):
+    """Latency summary in milliseconds"""
+    ordered = sorted(values)
+    to_ms = 1000.0
+    return {
+        "count": len(ordered),
+        "mean_ms": round(sum(ordered) / len(ordered) * to_ms, 3) if ordered else 0.0,
+        "p50_ms": round(percentile(ordered, 50) * to_ms, 3),
+        "p90_ms": round(percentile(ordered, 90) * to_ms, 3),
+        "p99_ms": round(percentile(ordered, 99) * to_ms, 3),
+        "max_ms": round(ordered[-1] * to_ms, 3) if ordered else 0.0,
+    }
+
+
+# Stage name -> function in email_automation that implements it
+STAGES = {
+    "list": "list_unread_emails",
+    "fetch": "get_email_details",
+    "fetch_email": "fetch_email",
+    "classify": "classify_email",
+    "detect_meeting": "detect_meeting",
+    "generate_reply": "generate_reply_with_gemini",
+    "calendar": "add_to_calendar",
+    "send": "send_email",
+}
+
+
+def _timed(stage, func, stats):
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            stats.record(stage, time.perf_counter() - start)
+    wrapper.__wrapped__ = func
+    return wrapper
+
+
+@contextlib.contextmanager
+def patched(module, **attrs):
+    """Temporarily replace module attributes, restoring them afterwards"""
+    missing = object()
+    saved = {name: getattr(module, name, missing) for name in attrs}
+    try:
+        for name, value in attrs.items():
+            setattr(module, name, value)
+        yield
+    finally:
+        for name, value in saved.items():
+            if value is missing:
+                delattr(module, name)
+            else:
+                setattr(module, name, value)
+
+
+# ============================================
+# RUNNER
+# ============================================
+
+def run_benchmark(config, verbose=False):
+    """Replay one synthetic inbox and return the result document"""
+    corpus = generate_corpus(
+        count=config["emails"],
+        spam_ratio=config["spam_ratio"],
+        meeting_ratio=config["meeting_ratio"],
+        attachment_ratio=config["attachment_ratio"],
+        body_chars=config["body_chars"],
+        attachment_kb=config["attachment_kb"],
+        invite_ratio=config["invite_ratio"],
+        seed=config["seed"],
+    )
+    corpus_bytes = sum(m["sizeEstimate"] for m in corpus)
+
+    stats = BenchmarkStats()
+    seed = config["seed"]
+    gmail = FakeGmailService(corpus, FakeBackend(
+        "gmail", config["gmail_latency_ms"], config["jitter"],
+        config["gmail_error_rate"], seed + 1, stats))
+    calendar = FakeCalendarService(FakeBackend(
+        "calendar", config["calendar_latency_ms"], config["jitter"],
+        config["calendar_error_rate"], seed + 2, stats))
+    gemini = FakeGemini(FakeBackend(
+        "gemini", config["gemini_latency_ms"], config["jitter"],
+        config["gemini_error_rate"], seed + 3, stats,
+        config["gemini_slow_rate"], config["gemini_slow_ms"]))
+    breaker = email_automation.CircuitBreaker(
+        config["breaker_threshold"], config["breaker_cooldown"])
+    operator = ScriptedAnswers(think_ms=config["think_ms"], stats=stats)
+
+    # In-memory reputation so runs never read or write sender_reputation.json
+    reputation = email_automation.SenderReputation(path=None)
+    if config["known_bulk"]:
+        for sender in SPAM_SENDERS:
+            for _ in range(reputation.min_seen):
+                reputation.record(sender, "SPAM")
+    prefilter = email_automation.PrefilterRules(
+        newer_than=config["newer_than"],
+        exclude_categories=config["exclude_categories"],
+        skip_known_bulk=config["skip_known_bulk"],
+        metadata_first=config["metadata_first"],
+        reputation=reputation,
+    )
+
+    instrumented = {
+        func_name: _timed(stage, getattr(email_automation, func_name), stats)
+        for stage, func_name in STAGES.items()
+    }
+
+    error = None
+    sink = None if verbose else io.StringIO()
+    output = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(sink)
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        with patched(email_automation, genai=gemini, GEMINI_API_KEY="benchmark",
+                     GEMINI_LATENCY_BUDGET=config["gemini_budget"],
+                     gemini_breaker=breaker,
+                     gemini_slots=threading.BoundedSemaphore(email_automation.GEMINI_MAX_IN_FLIGHT),
+                     **instrumented), output:
+            email_automation.process_incoming_emails(
+                gmail_service=gmail,
+                calendar_service=calendar,
+                ask=operator,
+                max_results=config["emails"],
+                lookahead=config["lookahead"],
+                max_speculative=config["speculative_budget"],
+                prefilter=prefilter,
+            )
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    wall = time.perf_counter() - start
+    _, peak_memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    processed = len(stats.timings.get("fetch_email", []))
+
+    return {
+        "meta": {
+            "commit": _git_commit(),
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "config": config,
+        },
+        "results": {
+            "status": "error" if error else "ok",
+            "error": error,
+            "emails_processed": processed,
+            "corpus_bytes": corpus_bytes,
+            "wall_seconds": round(wall, 4),
+            "throughput_eps": round(processed / wall, 3) if wall > 0 else 0.0,
+            "peak_memory_bytes": peak_memory,
+            "stages": {
+                stage: summarize_timings(values)
+                for stage, values in sorted(stats.timings.items())
+            },
+            "api_calls": dict(sorted(stats.calls.items())),
+            "api_errors": dict(sorted(stats.errors.items())),
+            "bytes_transferred": dict(sorted(stats.bytes.items())),
+            "bytes_transferred_total": sum(stats.bytes.values()),
+            "sent": len(gmail.sent),
+            "calendar_events": len(calendar.inserted),
+            "calendar_updates": len(calendar.patched),
+            "known_bulk_excluded": prefilter.excluded_bulk,
+            "gemini_breaker_state": breaker.state,
+        },
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+# ============================================
+# REPORTING
+# ============================================
+
+def print_report(result):
+    """Human-readable summary of one result document"""
+    res = result["results"]
+    print("=" * 70)
+    print(f"BENCHMARK RESULTS (commit {result['meta']['commit'] or 'unknown'})")
+    print("=" * 70)
+    if res["error"]:
+        print(f"⚠️  Run aborted: {res['error']}")
+    print(f"Emails processed: {res['emails_processed']}")
+    print(f"Wall time:        {res['wall_seconds']:.3f}s")
+    print(f"Throughput:       {res['throughput_eps']:.2f} emails/s")
+    print(f"Peak memory:      {res['peak_memory_bytes'] / 1024:.1f} KiB")
+    print(f"Bytes received:   {res['bytes_transferred_total']:,}")
+
+    print("\n" + "-" * 70)
+    print(f"{'stage':<18}{'count':>7}{'p50 ms':>11}{'p90 ms':>11}{'p99 ms':>11}{'max ms':>11}")
+    for stage, s in res["stages"].items():
+        print(f"{stage:<18}{s['count']:>7}{s['p50_ms']:>11.2f}{s['p90_ms']:>11.2f}"
+              f"{s['p99_ms']:>11.2f}{s['max_ms']:>11.2f}")
+
+    print("\n" + "-" * 70)
+    for key, count in res["api_calls"].items():
+        errors = res["api_errors"].get(key, 0)
+        suffix = f" ({errors} errors)" if errors else ""
+        print(f"{key:<40}{count:>7}{suffix}")
+    print("=" * 70)
+
+
+def compare_results(previous, current):
+    """Print key metric deltas between two result documents"""
+    def delta(old, new):
+        if not old:
+            return "n/a"
+        return f"{(new - old) / old * 100:+.1f}%"
+
+    old, new = previous["results"], current["results"]
+    rows = [
+        ("throughput_eps", old["throughput_eps"], new["throughput_eps"]),
+        ("wall_seconds", old["wall_seconds"], new["wall_seconds"]),
+        ("peak_memory_bytes", old["peak_memory_bytes"], new["peak_memory_bytes"]),
+        ("bytes_transferred_total", old["bytes_transferred_total"],
+         new["bytes_transferred_total"]),
+    ]
+    for stage in sorted(set(old["stages"]) | set(new["stages"])):
+        for metric in ("p50_ms", "p99_ms"):
+            rows.append((
+                f"{stage}.{metric}",
+                old["stages"].get(stage, {}).get(metric, 0.0),
+                new["stages"].get(stage, {}).get(metric, 0.0),
+            ))
+    for key in sorted(set(old["api_calls"]) | set(new["api_calls"])):
+        rows.append((f"calls.{key}", old["api_calls"].get(key, 0),
+                     new["api_calls"].get(key, 0)))
+
+    print("\n" + "=" * 70)
+    print(f"COMPARISON {previous['meta']['commit']} → {current['meta']['commit']}")
+    print("=" * 70)
+    print(f"{'metric':<40}{'before':>10}{'after':>10}{'change':>10}")
+    for name, before, after in rows:
+        print(f"{name:<40}{before:>10.4g}{after:>10.4g}{delta(before, after):>10}")
+
+
+# ============================================
+# COMMAND LINE
+# ============================================
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Replay benchmark for email_automation.py")
+    corpus = parser.add_argument_group("corpus")
+    corpus.add_argument("--emails", type=int, default=100)
+    corpus.add_argument("--spam-ratio", type=float, default=0.3)
+    corpus.add_argument("--meeting-ratio", type=float, default=0.2)
+    corpus.add_argument("--attachment-ratio", type=float, default=0.1)
+    corpus.add_argument("--body-chars", type=int, default=1500)
+    corpus.add_argument("--attachment-kb", type=int, default=64)
+    corpus.add_argument("--invite-ratio", type=float, default=0.0,
+                        help="fraction of meeting emails with a text/calendar invite")
+    corpus.add_argument("--seed", type=int, default=42)
+
+    fakes = parser.add_argument_group("fake services")
+    fakes.add_argument("--gmail-latency-ms", type=float, default=0.0)
+    fakes.add_argument("--calendar-latency-ms", type=float, default=0.0)
+    fakes.add_argument("--gemini-latency-ms", type=float, default=0.0)
+    fakes.add_argument("--jitter", type=float, default=0.2,
+                       help="relative latency jitter, 0.2 = ±20%%")
+    fakes.add_argument("--gmail-error-rate", type=float, default=0.0)
+    fakes.add_argument("--calendar-error-rate", type=float, default=0.0)
+    fakes.add_argument("--gemini-error-rate", type=float, default=0.0)
+    fakes.add_argument("--gemini-slow-rate", type=float, default=0.0,
+                       help="fraction of Gemini calls that take --gemini-slow-ms")
+    fakes.add_argument("--gemini-slow-ms", type=float, default=0.0)
+    fakes.add_argument("--think-ms", type=float, default=0.0,
+                       help="simulated operator think time per prompt")
+
+    workflow = parser.add_argument_group("workflow")
+    workflow.add_argument("--lookahead", type=int, default=email_automation.LOOKAHEAD,
+                          help="emails prepared ahead of the one under review (0 = off)")
+    workflow.add_argument("--speculative-budget", type=int,
+                          default=email_automation.SPECULATIVE_REPLY_BUDGET,
+                          help="max speculative Gemini drafts per run")
+    workflow.add_argument("--gemini-budget", type=float,
+                          default=email_automation.GEMINI_LATENCY_BUDGET,
+                          help="Gemini latency budget in seconds (0 = wait indefinitely)")
+    workflow.add_argument("--breaker-threshold", type=int,
+                          default=email_automation.GEMINI_BREAKER_THRESHOLD)
+    workflow.add_argument("--breaker-cooldown", type=float,
+                          default=email_automation.GEMINI_BREAKER_COOLDOWN)
+    workflow.add_argument("--no-metadata-first", dest="metadata_first", action="store_false",
+                          help="always download the full raw message")
+    workflow.add_argument("--newer-than", help="e.g. 7d")
+    workflow.add_argument("--exclude-category", action="append", default=[],
+                          help="Gmail tab to exclude server-side (repeatable)")
+    workflow.add_argument("--known-bulk", action="store_true",
+                          help="start with the corpus' spam senders marked as known-bulk")
+    workflow.add_argument("--no-skip-known-bulk", dest="skip_known_bulk", action="store_false",
+                          help="do not exclude known-bulk senders in the query")
+
+    out = parser.add_argument_group("output")
+    out.add_argument("-o", "--output", help="write the result JSON to this file")
+    out.add_argument("--compare", help="previous result JSON to compare against")
+    out.add_argument("--verbose", action="store_true",
+                     help="show the workflow's own console output")
+    return parser
+
+
+def config_from_args(args):
+    return {
+        "emails": args.emails,
+        "spam_ratio": args.spam_ratio,
+        "meeting_ratio": args.meeting_ratio,
+        "attachment_ratio": args.attachment_ratio,
+        "body_chars": args.body_chars,
+        "attachment_kb": args.attachment_kb,
+        "invite_ratio": args.invite_ratio,
+        "seed": args.seed,
+        "gmail_latency_ms": args.gmail_latency_ms,
+        "calendar_latency_ms": args.calendar_latency_ms,
+        "gemini_latency_ms": args.gemini_latency_ms,
+        "jitter": args.jitter,
+        "gmail_error_rate": args.gmail_error_rate,
+        "calendar_error_rate": args.calendar_error_rate,
+        "gemini_error_rate": args.gemini_error_rate,
+        "gemini_slow_rate": args.gemini_slow_rate,
+        "gemini_slow_ms": args.gemini_slow_ms,
+        "think_ms": args.think_ms,
+        "lookahead": args.lookahead,
+        "speculative_budget": args.speculative_budget,
+        "gemini_budget": args.gemini_budget,
+        "breaker_threshold": args.breaker_threshold,
+        "breaker_cooldown": args.breaker_cooldown,
+        "metadata_first": args.metadata_first,
+        "newer_than": args.newer_than,
+        "exclude_categories": args.exclude_category,
+        "known_bulk": args.known_bulk,
+        "skip_known_bulk": args.skip_known_bulk,
+    }
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    result = run_benchmark(config_from_args(args), verbose=args.verbose)
+    print_report(result)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"\n✓ Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare_results(json.load(f), result)
+
+    return 0 if result["results"]["status"] == "ok" else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -19,10 +19,18 @@ Date: November 2025
 import os
 import pickle
 import base64
+import html
+import io
+import json
 import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from email import message_from_bytes
 from email.mime.text import MIMEText
+from zoneinfo import ZoneInfo
 
 from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
@@ -49,6 +57,31 @@ TIMEZONE = "Asia/Kolkata"
 # Gemini API Configuration
 GEMINI_API_KEY = os.getenv('GEMINI_API_KEY', '')
 
+# Gemini latency budget in seconds per generation (None waits indefinitely).
+# After GEMINI_BREAKER_THRESHOLD failed or over-budget calls in a row Gemini
+# is skipped for GEMINI_BREAKER_COOLDOWN seconds, then probed once.
+GEMINI_LATENCY_BUDGET = 8.0
+GEMINI_BREAKER_THRESHOLD = 3
+GEMINI_BREAKER_COOLDOWN = 60.0
+GEMINI_MAX_IN_FLIGHT = 4               # concurrent Gemini calls, incl. abandoned ones
+
+# Lookahead: emails fetched/classified ahead of the one under review, and
+# the cap on speculative Gemini drafts per run (0 disables either)
+LOOKAHEAD = 3
+SPECULATIVE_REPLY_BUDGET = 10
+
+# Server-side pre-filter (see PrefilterRules). Excluded mail is never
+# listed; with METADATA_FIRST, headers and snippet are fetched first and
+# the full message only when the email is not already known to be SPAM.
+PREFILTER_NEWER_THAN = None            # e.g. "7d"
+PREFILTER_EXCLUDE_CATEGORIES = []      # e.g. ["promotions", "social"]
+PREFILTER_EXCLUDE_SENDERS = []         # addresses never fetched
+PREFILTER_SKIP_KNOWN_BULK = True       # exclude senders the reputation marks as bulk
+PREFILTER_BULK_CATEGORIES = ["promotions", "social"]  # Gmail tabs treated as SPAM
+PREFILTER_METADATA_FIRST = True
+REPUTATION_FILE = "sender_reputation.json"
+REPUTATION_RECHECK_DAYS = 14           # known-bulk senders are fetched and classified again after this
+
 
 # ============================================
 # TONE ENGINE - Smart Tone Adjustment
@@ -159,68 +192,412 @@ def authenticate_google():
     return gmail_service, calendar_service
 
 
+# ============================================
+# CALENDAR INVITE PARSING (ICS)
+# ============================================
+
+INVITE_CONTENT_TYPES = ("text/calendar", "application/ics")
+
+ICS_DURATION = re.compile(
+    r'^([+-])?P(?:(\d+)W)?(?:(\d+)D)?(?:T(?:(\d+)H)?(?:(\d+)M)?(?:(\d+)S)?)?$'
+)
+ICS_UTC_OFFSET = re.compile(r'^([+-])(\d\d)(\d\d)(\d\d)?$')
+
+# Windows time zone names (used by Outlook/Exchange invites) -> IANA
+WINDOWS_TIMEZONES = {
+    "Dateline Standard Time": "Etc/GMT+12",
+    "Hawaiian Standard Time": "Pacific/Honolulu",
+    "Alaskan Standard Time": "America/Anchorage",
+    "Pacific Standard Time": "America/Los_Angeles",
+    "US Mountain Standard Time": "America/Phoenix",
+    "Mountain Standard Time": "America/Denver",
+    "Mountain Standard Time (Mexico)": "America/Mazatlan",
+    "Central America Standard Time": "America/Guatemala",
+    "Central Standard Time": "America/Chicago",
+    "Central Standard Time (Mexico)": "America/Mexico_City",
+    "Canada Central Standard Time": "America/Regina",
+    "SA Pacific Standard Time": "America/Bogota",
+    "Eastern Standard Time": "America/New_York",
+    "US Eastern Standard Time": "America/Indiana/Indianapolis",
+    "Atlantic Standard Time": "America/Halifax",
+    "SA Western Standard Time": "America/La_Paz",
+    "Pacific SA Standard Time": "America/Santiago",
+    "Newfoundland Standard Time": "America/St_Johns",
+    "E. South America Standard Time": "America/Sao_Paulo",
+    "Argentina Standard Time": "America/Argentina/Buenos_Aires",
+    "UTC": "Etc/UTC",
+    "GMT Standard Time": "Europe/London",
+    "Greenwich Standard Time": "Atlantic/Reykjavik",
+    "W. Europe Standard Time": "Europe/Berlin",
+    "Central Europe Standard Time": "Europe/Budapest",
+    "Romance Standard Time": "Europe/Paris",
+    "Central European Standard Time": "Europe/Warsaw",
+    "W. Central Africa Standard Time": "Africa/Lagos",
+    "GTB Standard Time": "Europe/Bucharest",
+    "FLE Standard Time": "Europe/Helsinki",
+    "Israel Standard Time": "Asia/Jerusalem",
+    "Egypt Standard Time": "Africa/Cairo",
+    "South Africa Standard Time": "Africa/Johannesburg",
+    "Turkey Standard Time": "Europe/Istanbul",
+    "Arab Standard Time": "Asia/Riyadh",
+    "Russian Standard Time": "Europe/Moscow",
+    "E. Africa Standard Time": "Africa/Nairobi",
+    "Iran Standard Time": "Asia/Tehran",
+    "Arabian Standard Time": "Asia/Dubai",
+    "Pakistan Standard Time": "Asia/Karachi",
+    "India Standard Time": "Asia/Kolkata",
+    "Sri Lanka Standard Time": "Asia/Colombo",
+    "Nepal Standard Time": "Asia/Kathmandu",
+    "Bangladesh Standard Time": "Asia/Dhaka",
+    "SE Asia Standard Time": "Asia/Bangkok",
+    "China Standard Time": "Asia/Shanghai",
+    "Singapore Standard Time": "Asia/Singapore",
+    "Taipei Standard Time": "Asia/Taipei",
+    "W. Australia Standard Time": "Australia/Perth",
+    "Tokyo Standard Time": "Asia/Tokyo",
+    "Korea Standard Time": "Asia/Seoul",
+    "AUS Central Standard Time": "Australia/Darwin",
+    "Cen. Australia Standard Time": "Australia/Adelaide",
+    "E. Australia Standard Time": "Australia/Brisbane",
+    "AUS Eastern Standard Time": "Australia/Sydney",
+    "Tasmania Standard Time": "Australia/Hobart",
+    "New Zealand Standard Time": "Pacific/Auckland",
+}
+
+
+class MeetingInvite:
+    """
+    Exact meeting details taken from a VEVENT.
+
+    `start`/`end` are naive datetimes in `timezone`, or dates for all-day
+    events. A cancelled invite may have no start/end. `sequence` is the
+    iCalendar revision number; updates to the same UID increase it.
+    """
+    __slots__ = ("uid", "summary", "start", "end", "timezone", "organizer", "sequence", "cancelled")
+
+    uid: str
+    summary: str
+    start: datetime
+    end: datetime
+    timezone: str
+    organizer: str
+    sequence: int
+    cancelled: bool
+
+    def __init__(self, uid, summary, start, end, timezone, organizer, sequence=0, cancelled=False):
+        self.uid = uid
+        self.summary = summary
+        self.start = start
+        self.end = end
+        self.timezone = timezone
+        self.organizer = organizer
+        self.sequence = sequence
+        self.cancelled = cancelled
+
+    def __repr__(self):
+        return (f"MeetingInvite(uid={self.uid!r}, start={self.start!r}, "
+                f"timezone={self.timezone!r}, cancelled={self.cancelled!r})")
+
+
+def _unfold_ics(lines):
+    """Yield logical iCalendar lines, joining RFC 5545 folded continuations"""
+    pending = None
+    for raw in lines:
+        line = raw.rstrip("\r\n")
+        if line[:1] in (" ", "\t") and pending is not None:
+            pending += line[1:]
+            continue
+        if pending is not None:
+            yield pending
+        pending = line
+    if pending is not None:
+        yield pending
+
+
+def _split_ics_property(line):
+    """Split 'NAME;PARAM=V:value' into (NAME, {PARAM: V}, value)"""
+    in_quotes = False
+    for pos, char in enumerate(line):
+        if char == '"':
+            in_quotes = not in_quotes
+        elif char == ":" and not in_quotes:
+            break
+    else:
+        return None, {}, ""
+    
+    name, *param_items = line[:pos].split(";")
+    params = {}
+    for item in param_items:
+        key, _, value = item.partition("=")
+        params[key.upper()] = value.strip('"')
+    return name.upper(), params, line[pos + 1:]
+
+
+def _ics_text(value):
+    """Undo iCalendar TEXT escaping (\\n, \\, \\; \\\\)"""
+    return re.sub(r'\\(.)', lambda m: "\n" if m.group(1) in "nN" else m.group(1), value)
+
+
+def _is_iana_timezone(name):
+    try:
+        ZoneInfo(name)
+        return True
+    except Exception:
+        return False
+
+
+def _parse_utc_offset(value):
+    match = ICS_UTC_OFFSET.match(value.strip())
+    if not match:
+        return None
+    sign, hours, minutes, seconds = match.groups()
+    offset = timedelta(hours=int(hours), minutes=int(minutes), seconds=int(seconds or 0))
+    return -offset if sign == "-" else offset
+
+
+def _resolve_tzid(tzid, zones):
+    """
+    Map a TZID to (IANA name, None) or ("UTC", fixed UTC offset).
+
+    Tries the TZID itself, the Windows name table, the VTIMEZONE's
+    X-LIC-LOCATION and finally a VTIMEZONE without DST changes. Raises
+    ValueError when the zone cannot be determined.
+    """
+    definition = zones.get(tzid, {})
+    for candidate in (tzid, WINDOWS_TIMEZONES.get(tzid), definition.get("location")):
+        if candidate and _is_iana_timezone(candidate):
+            return candidate, None
+    
+    offsets = set(definition.get("offsets", ()))
+    if len(offsets) == 1 and None not in offsets:
+        return "UTC", offsets.pop()
+    raise ValueError(f"unknown time zone {tzid!r}")
+
+
+def _parse_ics_time(params, value, zones):
+    """Return (datetime or date, timezone) for a DTSTART/DTEND value"""
+    if params.get("VALUE") == "DATE" or len(value) == 8:
+        return datetime.strptime(value, "%Y%m%d").date(), TIMEZONE
+    if value.endswith("Z"):
+        return datetime.strptime(value[:-1], "%Y%m%dT%H%M%S"), "UTC"
+    
+    local = datetime.strptime(value, "%Y%m%dT%H%M%S")
+    tzid = params.get("TZID")
+    if not tzid:
+        return local, TIMEZONE  # floating time
+    
+    timezone, offset = _resolve_tzid(tzid, zones)
+    return (local - offset if offset is not None else local), timezone
+
+
+def _parse_ics_duration(value):
+    match = ICS_DURATION.match(value.strip())
+    if not match:
+        return None
+    sign, weeks, days, hours, minutes, seconds = match.groups()
+    delta = timedelta(weeks=int(weeks or 0), days=int(days or 0), hours=int(hours or 0),
+                      minutes=int(minutes or 0), seconds=int(seconds or 0))
+    return -delta if sign == "-" else delta
+
+
+def parse_ics(lines):
+    """
+    Parse the first VEVENT of an iCalendar payload into a MeetingInvite.
+
+    `lines` is any iterable of text lines (e.g. an open file or StringIO);
+    parsing stops at the first END:VEVENT, so the rest of the payload is
+    never read. VTIMEZONE blocks seen before the event are used to
+    resolve non-IANA TZIDs (see _resolve_tzid). Cancellations
+    (METHOD:CANCEL or STATUS:CANCELLED) come back with `cancelled` set.
+    Returns None for other events without a usable DTSTART or whose time
+    zone cannot be resolved - such invites are not exact.
+    """
+    method = None
+    in_event = False
+    nested = 0
+    props = {}
+    zones = {}  # TZID -> {"location": X-LIC-LOCATION, "offsets": [TZOFFSETTO, ...]}
+    zone = None
+    
+    for line in _unfold_ics(lines):
+        name, params, value = _split_ics_property(line)
+        if name is None:
+            continue
+        
+        if name == "BEGIN":
+            if in_event:
+                nested += 1  # VALARM etc. - their properties are not the event's
+            elif value.upper() == "VEVENT":
+                in_event = True
+            elif value.upper() == "VTIMEZONE":
+                zone = {"offsets": []}
+        elif name == "END":
+            if nested:
+                nested -= 1
+            elif in_event and value.upper() == "VEVENT":
+                break
+            elif value.upper() == "VTIMEZONE":
+                zone = None
+        elif not in_event:
+            if name == "METHOD":
+                method = value.strip().upper()
+            elif zone is not None:
+                if name == "TZID":
+                    zones[value.strip()] = zone
+                elif name == "X-LIC-LOCATION":
+                    zone["location"] = value.strip()
+                elif name == "TZOFFSETTO":
+                    zone["offsets"].append(_parse_utc_offset(value))
+        elif not nested and name not in props:
+            props[name] = (params, value)
+    
+    status = props.get("STATUS", ({}, ""))[1].strip().upper()
+    cancelled = method == "CANCEL" or status == "CANCELLED"
+    
+    start = end = None
+    timezone = TIMEZONE
+    try:
+        if "DTSTART" in props:
+            start, timezone = _parse_ics_time(*props["DTSTART"], zones)
+            if "DTEND" in props:
+                end, end_timezone = _parse_ics_time(*props["DTEND"], zones)
+                if isinstance(end, datetime) and end_timezone != timezone:
+                    end = (end.replace(tzinfo=ZoneInfo(end_timezone))
+                           .astimezone(ZoneInfo(timezone)).replace(tzinfo=None))
+            elif "DURATION" in props:
+                duration = _parse_ics_duration(props["DURATION"][1])
+                end = start + duration if duration is not None else None
+    except ValueError:
+        start = end = None  # the time is unusable; only a cancellation still counts
+    
+    if start is None:
+        if not cancelled:
+            return None
+    elif end is None:
+        end = start + (timedelta(days=1) if not isinstance(start, datetime) else timedelta(minutes=30))
+    
+    organizer = ""
+    if "ORGANIZER" in props:
+        params, value = props["ORGANIZER"]
+        address = re.sub(r'^mailto:', '', value, flags=re.IGNORECASE)
+        organizer = f"{params['CN']} <{address}>" if params.get("CN") else address
+    
+    sequence = props.get("SEQUENCE", ({}, "0"))[1].strip()
+    
+    return MeetingInvite(
+        uid=props.get("UID", ({}, ""))[1].strip(),
+        summary=_ics_text(props.get("SUMMARY", ({}, ""))[1]),
+        start=start,
+        end=end,
+        timezone=timezone,
+        organizer=organizer,
+        sequence=int(sequence) if sequence.isdigit() else 0,
+        cancelled=cancelled
+    )
+
+
 # ============================================
 # EMAIL FETCHING & PROCESSING
 # ============================================
 
-def list_unread_emails(gmail_service, max_results=20):
-    """Fetch unread emails from Gmail"""
+def list_unread_emails(gmail_service, max_results=20, query="is:unread"):
+    """Fetch unread emails from Gmail (ids only)"""
     response = gmail_service.users().messages().list(
         userId="me",
-        q="is:unread",
-        maxResults=max_results
+        q=query,
+        maxResults=max_results,
+        fields="messages/id"
     ).execute()
     
     return response.get("messages", [])
 
 
+class EmailRecord:
+    """
+    Fetched email reduced to the fields the workflow reads.
+
+    The parsed Message object is dropped as soon as the body and any
+    calendar invite have been extracted.
+    """
+    __slots__ = ("id", "sender", "subject", "body", "invite")
+
+    id: str
+    sender: str
+    subject: str
+    body: str
+    invite: MeetingInvite
+
+    def __init__(self, id, sender, subject, body, invite=None):
+        self.id = id
+        self.sender = sender
+        self.subject = subject
+        self.body = body
+        self.invite = invite
+
+    def __repr__(self):
+        return f"EmailRecord(id={self.id!r}, sender={self.sender!r}, subject={self.subject!r})"
+
+
 def get_email_details(gmail_service, msg_id):
-    """Get full email details including sender, subject, body"""
+    """Get email details (sender, subject, body, invite) as an EmailRecord"""
     message = gmail_service.users().messages().get(
         userId="me",
         id=msg_id,
-        format="raw"
+        format="raw",
+        fields="raw"
     ).execute()
     
     raw_data = base64.urlsafe_b64decode(message["raw"].encode("ASCII"))
     email_msg = message_from_bytes(raw_data)
+    body, invite = extract_content(email_msg)
     
-    sender = email_msg.get("From", "")
-    subject = email_msg.get("Subject", "")
-    body = extract_body(email_msg)
-    
-    return {
-        "id": msg_id,
-        "sender": sender,
-        "subject": subject,
-        "body": body,
-        "email_object": email_msg
-    }
+    return EmailRecord(
+        id=msg_id,
+        sender=email_msg.get("From", ""),
+        subject=email_msg.get("Subject", ""),
+        body=body,
+        invite=invite
+    )
+
+
+def _decode_part(part):
+    """Decode a non-multipart payload to text, or None if it cannot be"""
+    try:
+        return part.get_payload(decode=True).decode(
+            part.get_content_charset() or "utf-8",
+            errors="replace"
+        )
+    except Exception:
+        return None
+
+
+def extract_content(email_obj):
+    """Extract plain text body and the first calendar invite in a single walk"""
+    invite = None
+    
+    if not email_obj.is_multipart():
+        body = _decode_part(email_obj) or ""
+        if email_obj.get_content_type() in INVITE_CONTENT_TYPES:
+            invite = parse_ics(io.StringIO(body))
+        return body, invite
+    
+    parts = []
+    for part in email_obj.walk():
+        content_type = part.get_content_type()
+        if content_type == "text/plain":
+            text = _decode_part(part)
+            if text is not None:
+                parts.append(text)
+        elif content_type in INVITE_CONTENT_TYPES and invite is None:
+            text = _decode_part(part)
+            if text is not None:
+                invite = parse_ics(io.StringIO(text))
+    return "\n\n".join(parts), invite
 
 
 def extract_body(email_obj):
     """Extract plain text body from email"""
-    if email_obj.is_multipart():
-        parts = []
-        for part in email_obj.walk():
-            if part.get_content_type() == "text/plain":
-                try:
-                    text = part.get_payload(decode=True).decode(
-                        part.get_content_charset() or "utf-8",
-                        errors="replace"
-                    )
-                    parts.append(text)
-                except:
-                    continue
-        return "\n\n".join(parts)
-    else:
-        try:
-            return email_obj.get_payload(decode=True).decode(
-                email_obj.get_content_charset() or "utf-8",
-                errors="replace"
-            )
-        except:
-            return ""
+    return extract_content(email_obj)[0]
 
 
 # ============================================
@@ -297,13 +674,220 @@ def detect_meeting(subject, body):
     return False
 
 
+# ============================================
+# SERVER-SIDE PRE-FILTER
+# ============================================
+
+def sender_address(sender):
+    """Bare email address from a From header ("Name <addr>" -> "addr")"""
+    match = re.search(r'<(.+?)>', sender)
+    return (match.group(1) if match else sender).strip().lower()
+
+
+class SenderReputation:
+    """
+    Per-sender tally of SPAM verdicts, persisted between runs.
+
+    A sender is known-bulk once at least `min_seen` of their emails have
+    been classified and `spam_ratio` of those were SPAM. At most
+    `max_senders` senders are kept; when full, the least-seen sender
+    (least recently seen among ties) makes room for a new one.
+
+    The verdict expires `recheck_days` after the sender was last seen, so
+    an excluded sender is listed and classified again. Its old counts are
+    halved at that point, letting a wrong verdict recover quickly.
+    """
+
+    def __init__(self, path=REPUTATION_FILE, min_seen=3, spam_ratio=0.9, max_senders=2000,
+                 recheck_days=REPUTATION_RECHECK_DAYS, clock=time.time):
+        self.path = path
+        self.min_seen = min_seen
+        self.spam_ratio = spam_ratio
+        self.max_senders = max_senders
+        self.recheck_days = recheck_days
+        self.clock = clock
+        self.senders = {}  # address -> [seen, spam, last seen (epoch seconds)]
+        
+        if path and os.path.exists(path):
+            try:
+                with open(path) as f:
+                    # Files without a last-seen time are due for a recheck
+                    self.senders = {k: (list(v) + [0])[:3] for k, v in json.load(f).items()}
+            except (OSError, ValueError):
+                self.senders = {}
+
+    def _stale(self, tally):
+        return self.clock() - tally[2] >= self.recheck_days * 86400
+
+    def record(self, sender, category):
+        """Count one classified email from `sender`"""
+        address = sender_address(sender)
+        tally = self.senders.pop(address, None)
+        if tally is None:
+            tally = [0, 0, 0]
+            if len(self.senders) >= self.max_senders:
+                # Dict order is recency order, so min() picks the stalest tie
+                least_seen = min(self.senders, key=lambda known: self.senders[known][0])
+                del self.senders[least_seen]
+        elif self._stale(tally):
+            tally[0] //= 2
+            tally[1] //= 2
+        self.senders[address] = tally  # re-inserted as most recent
+        
+        tally[0] += 1
+        if category == "SPAM":
+            tally[1] += 1
+        tally[2] = self.clock()
+
+    def is_bulk(self, sender):
+        """True for a sender with a mostly-SPAM history that is not due for a recheck"""
+        tally = self.senders.get(sender_address(sender))
+        if tally is None or self._stale(tally):
+            return False
+        seen, spam = tally[0], tally[1]
+        return seen >= self.min_seen and spam >= seen * self.spam_ratio
+
+    def bulk_senders(self, limit=50):
+        """Known-bulk addresses, most SPAM first"""
+        bulk = [address for address in self.senders if self.is_bulk(address)]
+        bulk.sort(key=lambda address: -self.senders[address][1])
+        return bulk[:limit]
+
+    def save(self):
+        if not self.path:
+            return
+        with open(self.path, "w") as f:
+            json.dump(self.senders, f)
+
+
+class PrefilterRules:
+    """
+    Compiles filtering rules into a Gmail search query and decides SPAM
+    from message metadata where possible.
+
+    - newer_than / exclude_categories / exclude_senders become `newer_than:`,
+      `-category:` and `-from:(...)` clauses
+    - with skip_known_bulk, the reputation's known-bulk senders are
+      excluded as well (at most `max_query_senders` addresses)
+    - bulk_categories are Gmail tabs whose mail is classified as SPAM
+      straight from its labels
+    """
+
+    def __init__(self, newer_than=None, exclude_categories=(), exclude_senders=(),
+                 skip_known_bulk=True, bulk_categories=("promotions", "social"),
+                 metadata_first=True, reputation=None, max_query_senders=50):
+        self.newer_than = newer_than
+        self.exclude_categories = list(exclude_categories)
+        self.exclude_senders = list(exclude_senders)
+        self.skip_known_bulk = skip_known_bulk
+        self.bulk_labels = {f"CATEGORY_{c.upper()}" for c in bulk_categories}
+        self.metadata_first = metadata_first
+        self.reputation = reputation
+        self.max_query_senders = max_query_senders
+        self.excluded_bulk = 0  # known-bulk senders left out by the last query()
+
+    @classmethod
+    def from_config(cls):
+        """Rules from the CONFIGURATION section, with the persisted reputation"""
+        return cls(
+            newer_than=PREFILTER_NEWER_THAN,
+            exclude_categories=PREFILTER_EXCLUDE_CATEGORIES,
+            exclude_senders=PREFILTER_EXCLUDE_SENDERS,
+            skip_known_bulk=PREFILTER_SKIP_KNOWN_BULK,
+            bulk_categories=PREFILTER_BULK_CATEGORIES,
+            metadata_first=PREFILTER_METADATA_FIRST,
+            reputation=SenderReputation(REPUTATION_FILE)
+        )
+
+    def query(self):
+        """Gmail search query for the messages worth listing"""
+        clauses = ["is:unread"]
+        if self.newer_than:
+            clauses.append(f"newer_than:{self.newer_than}")
+        clauses.extend(f"-category:{category}" for category in self.exclude_categories)
+        
+        configured = [sender_address(s) for s in self.exclude_senders]
+        bulk = []
+        if self.skip_known_bulk and self.reputation:
+            bulk = self.reputation.bulk_senders(self.max_query_senders)
+        senders = list(dict.fromkeys(configured + bulk))[:self.max_query_senders]
+        self.excluded_bulk = len(set(senders).difference(configured))
+        if senders:
+            clauses.append("-from:(" + " OR ".join(senders) + ")")
+        
+        return " ".join(clauses)
+
+    def bulk_reason(self, sender, label_ids):
+        """"label" or "reputation" if either already marks this email as SPAM, else None"""
+        if self.bulk_labels.intersection(label_ids):
+            return "label"
+        if self.reputation and self.reputation.is_bulk(sender):
+            return "reputation"
+        return None
+
+
+def _has_plain_text(payload):
+    """True if a metadata payload (or any part listed in it) is text/plain"""
+    if payload.get("mimeType") == "text/plain":
+        return True
+    return any(_has_plain_text(part) for part in payload.get("parts", []))
+
+
+def fetch_email(gmail_service, msg_id, prefilter=None):
+    """
+    Fetch an email, deciding SPAM from metadata alone where possible.
+
+    With a metadata-first prefilter only the From/Subject headers, labels,
+    MIME structure and snippet are requested; bulk-tab, known-bulk and
+    keyword-spam emails stop there (body = snippet). Everything else
+    escalates to a full get_email_details().
+
+    Returns (EmailRecord, "SPAM" or None, reason), where reason tells
+    why SPAM was decided early: "label", "reputation" or "keywords".
+    """
+    if prefilter is None or not prefilter.metadata_first:
+        return get_email_details(gmail_service, msg_id), None, None
+    
+    message = gmail_service.users().messages().get(
+        userId="me",
+        id=msg_id,
+        format="metadata",
+        metadataHeaders=["From", "Subject"],
+        fields="labelIds,snippet,payload(mimeType,headers,parts(mimeType,parts/mimeType))"
+    ).execute()
+    
+    payload = message.get("payload", {})
+    headers = {h["name"].lower(): h["value"] for h in payload.get("headers", [])}
+    sender = headers.get("from", "")
+    subject = headers.get("subject", "")
+    snippet = html.unescape(message.get("snippet", ""))
+    record = EmailRecord(id=msg_id, sender=sender, subject=subject, body=snippet)
+    
+    reason = prefilter.bulk_reason(sender, message.get("labelIds", []))
+    if reason:
+        return record, "SPAM", reason
+    
+    # The snippet is only a stand-in for the body when the full fetch would
+    # classify text/plain content too: HTML-only mail has an empty body
+    # there. Gmail also cuts the snippet mid-word ("free" from "freedom"),
+    # so the last word is not trusted.
+    if _has_plain_text(payload):
+        words = snippet.split()
+        if classify_email(subject, " ".join(words[:-1]), sender) == "SPAM":
+            return record, "SPAM", "keywords"
+    
+    return get_email_details(gmail_service, msg_id), None, None
+
+
 # ============================================
 # GEMINI AI - REPLY GENERATION
 # ============================================
 
-def initialize_gemini():
+def initialize_gemini(quiet=False):
     """Initialize Gemini with API key"""
     if not GEMINI_API_KEY:
+        if quiet:
+            return False
         print("\n⚠️  Warning: GEMINI_API_KEY not set!")
         print("   Set it with: export GEMINI_API_KEY='your-key-here'")
         return False
@@ -312,10 +896,144 @@ def initialize_gemini():
     return True
 
 
-def generate_reply_with_gemini(original_email, reply_context, recipient_type, formality=0.5):
-    """Generate AI-powered email reply using Google Gemini"""
-    
-    if not initialize_gemini():
+class CircuitBreaker:
+    """
+    Skips a failing dependency until it recovers.
+
+    closed    - calls allowed; `threshold` consecutive failures open it
+    open      - calls skipped for `cooldown` seconds, then half-open
+    half-open - a single probe call; success closes, failure re-opens
+    """
+
+    def __init__(self, threshold=3, cooldown=60.0, clock=time.monotonic):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.clock = clock
+        self.state = "closed"
+        self.failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """Return True if a call may be attempted now"""
+        with self._lock:
+            if self.state == "open":
+                if self.clock() - self._opened_at < self.cooldown:
+                    return False
+                self.state = "half-open"
+                self._probing = False
+            if self.state == "half-open":
+                if self._probing:
+                    return False
+                self._probing = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.state = "closed"
+            self.failures = 0
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == "half-open" or self.failures >= self.threshold:
+                self.state = "open"
+                self._opened_at = self.clock()
+                self._probing = False
+
+
+gemini_breaker = CircuitBreaker(GEMINI_BREAKER_THRESHOLD, GEMINI_BREAKER_COOLDOWN)
+gemini_slots = threading.BoundedSemaphore(GEMINI_MAX_IN_FLIGHT)
+
+
+def call_gemini(prompt, latency_budget=None, on_late_result=None, quiet=False):
+    """
+    Run one Gemini completion under the latency budget and circuit breaker.
+
+    Returns the response text, or None when the caller should fall back to
+    a template (circuit open, all slots busy, error, or budget expired).
+    An expired budget counts as a breaker failure straight away; the call
+    keeps running on its daemon thread, holding one of the
+    GEMINI_MAX_IN_FLIGHT slots, and `on_late_result` is called with its
+    text should it eventually succeed. A late success does not reset the
+    breaker. `quiet` suppresses the console warnings (used for background
+    drafts).
+    """
+    if latency_budget is None:
+        latency_budget = GEMINI_LATENCY_BUDGET
+    
+    # Take the slot first: a half-open probe granted by allow() must
+    # always end in record_success/record_failure, or the breaker stays
+    # half-open with its probe outstanding forever
+    slots = gemini_slots
+    if not slots.acquire(blocking=False):
+        if not quiet:
+            print("   ⚠️  Gemini busy (too many calls in flight) - using template")
+        return None
+    
+    if not gemini_breaker.allow():
+        slots.release()
+        if not quiet:
+            print("   ⚠️  Gemini circuit open - using template")
+        return None
+    
+    outcome = {}
+    finished = threading.Event()
+    lock = threading.Lock()
+    
+    def worker():
+        try:
+            model = genai.GenerativeModel('gemini-2.5-flash')
+            outcome["text"] = model.generate_content(prompt).text.strip()
+        except Exception as e:
+            outcome["error"] = e
+        finally:
+            slots.release()
+        
+        with lock:
+            abandoned = outcome.get("abandoned", False)
+            # An abandoned call was already counted as a failure by the caller
+            if not abandoned:
+                if "error" in outcome:
+                    gemini_breaker.record_failure()
+                else:
+                    gemini_breaker.record_success()
+            finished.set()
+        if abandoned and on_late_result and "text" in outcome:
+            on_late_result(outcome["text"])
+    
+    threading.Thread(target=worker, daemon=True).start()
+    finished.wait(latency_budget or None)
+    
+    with lock:
+        if not finished.is_set():
+            outcome["abandoned"] = True
+            gemini_breaker.record_failure()
+            if not quiet:
+                print(f"   ⚠️  Gemini exceeded {latency_budget:g}s budget - using template")
+            return None
+    
+    if "error" in outcome:
+        if not quiet:
+            print(f"   ⚠️  Gemini error: {outcome['error']}")
+        return None
+    return outcome["text"]
+
+
+def generate_reply_with_gemini(original_email, reply_context, recipient_type, formality=0.5,
+                               latency_budget=None, on_upgrade=None, quiet=False):
+    """
+    Generate AI-powered email reply using Google Gemini
+
+    Falls back to generate_template_reply() when Gemini is unavailable,
+    fails or misses `latency_budget` (default GEMINI_LATENCY_BUDGET). In
+    the last case `on_upgrade` receives the Gemini reply if it arrives later.
+    `quiet` suppresses console warnings for calls made in the background.
+    """
+    
+    if not initialize_gemini(quiet):
         return generate_template_reply(original_email, reply_context, recipient_type, formality)
     
     tone_engine = ToneEngine()
@@ -324,9 +1042,9 @@ def generate_reply_with_gemini(original_email, reply_context, recipient_type, fo
     prompt = f"""You are an AI email assistant. Generate a professional email reply.
 
 Original Email:
-Subject: {original_email['subject']}
-From: {original_email['sender']}
-Body: {original_email['body'][:500]}
+Subject: {original_email.subject}
+From: {original_email.sender}
+Body: {original_email.body[:500]}
 
 Task: {reply_context}
 
@@ -338,11 +1056,7 @@ Requirements:
 
 Generate the email body now:"""
     
-    try:
-        model = genai.GenerativeModel('gemini-2.5-flash')
-        response = model.generate_content(prompt)
-        email_body = response.text.strip()
-        
+    def build_reply(email_body):
         # Format complete email
         full_reply = f"{tone_profile['greeting']},\n\n{email_body}\n\n{tone_profile['signoff']}"
         
@@ -354,9 +1068,12 @@ Generate the email body now:"""
             "tone": tone_profile['style']
         }
     
-    except Exception as e:
-        print(f"   ⚠️  Gemini error: {e}")
+    on_late_result = (lambda text: on_upgrade(build_reply(text))) if on_upgrade else None
+    email_body = call_gemini(prompt, latency_budget, on_late_result, quiet)
+    
+    if email_body is None:
         return generate_template_reply(original_email, reply_context, recipient_type, formality)
+    return build_reply(email_body)
 
 
 def generate_template_reply(original_email, reply_context, recipient_type, formality=0.5):
@@ -407,12 +1124,8 @@ Requirements:
 
 Generate the email body now:"""
     
-    try:
-        model = genai.GenerativeModel('gemini-2.5-flash')
-        response = model.generate_content(prompt)
-        body = response.text.strip()
-    except Exception as e:
-        print(f"   ⚠️  Gemini error: {e}")
+    body = call_gemini(prompt)
+    if body is None:
         body = f"Regarding: {context}\n\nI wanted to reach out to discuss this matter with you. Please let me know your thoughts."
     
     full_email = f"{tone_profile['greeting']},\n\n{body}\n\n{tone_profile['signoff']}"
@@ -476,22 +1189,71 @@ def extract_meeting_time(body):
     return meeting_time
 
 
-def add_to_calendar(calendar_service, subject, sender, meeting_time, duration_minutes=30):
-    """Add meeting event to Google Calendar"""
+def _event_instant(when):
+    """Comparable value for an event start/end: aware datetime, or date for all-day"""
+    if 'date' in when:
+        return when['date']
+    moment = datetime.fromisoformat(when['dateTime'].replace('Z', '+00:00'))
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=ZoneInfo(when.get('timeZone') or TIMEZONE))
+    return moment
+
+
+def add_to_calendar(calendar_service, subject, sender, meeting_time, duration_minutes=30,
+                    end_time=None, timezone=None, uid=None, sequence=None):
+    """
+    Add meeting event to Google Calendar
+
+    Invites pass their exact `end_time`, `timezone`, iCalendar `uid` and
+    `sequence`. An event already carrying that UID is not duplicated: it
+    is moved to the new start/end unless the stored event has a higher
+    sequence (i.e. this invite is an older revision).
+    `meeting_time` may be a date for all-day events.
+    """
+    existing = None
+    if uid:
+        items = calendar_service.events().list(
+            calendarId='primary',
+            iCalUID=uid
+        ).execute().get('items', [])
+        existing = items[0] if items else None
+        if existing and sequence is not None and existing.get('sequence', 0) > sequence:
+            return existing.get('htmlLink')
+    
     start_time = meeting_time
-    end_time = start_time + timedelta(minutes=duration_minutes)
+    if end_time is None:
+        end_time = start_time + timedelta(minutes=duration_minutes)
+    timezone = timezone or TIMEZONE
+    
+    if isinstance(start_time, datetime):
+        start = {'dateTime': start_time.isoformat(), 'timeZone': timezone}
+        end = {'dateTime': end_time.isoformat(), 'timeZone': timezone}
+    else:
+        start = {'date': start_time.isoformat()}
+        end = {'date': end_time.isoformat()}
+    
+    if existing:
+        changes = {}
+        for key, when in (('start', start), ('end', end)):
+            if key not in existing or _event_instant(existing[key]) != _event_instant(when):
+                # Null out the other form so a timed/all-day switch patches cleanly
+                changes[key] = dict({'date': None, 'dateTime': None, 'timeZone': None}, **when)
+        if not changes:
+            return existing.get('htmlLink')
+        if sequence is not None:
+            changes['sequence'] = sequence
+        event = calendar_service.events().patch(
+            calendarId='primary',
+            eventId=existing['id'],
+            body=changes
+        ).execute()
+        return event.get('htmlLink')
     
     event = {
         'summary': f'Meeting: {subject}',
         'description': f'Email from: {sender}',
-        'start': {
-            'dateTime': start_time.isoformat(),
-            'timeZone': TIMEZONE,
-        },
-        'end': {
-            'dateTime': end_time.isoformat(),
-            'timeZone': TIMEZONE,
-        },
+        'start': start,
+        'end': end,
         'reminders': {
             'useDefault': False,
             'overrides': [
@@ -500,6 +1262,11 @@ def add_to_calendar(calendar_service, subject, sender, meeting_time, duration_mi
         },
     }
     
+    if uid:
+        event['iCalUID'] = uid
+    if sequence is not None:
+        event['sequence'] = sequence
+    
     event = calendar_service.events().insert(
         calendarId='primary',
         body=event
@@ -508,25 +1275,284 @@ def add_to_calendar(calendar_service, subject, sender, meeting_time, duration_mi
     return event.get('htmlLink')
 
 
+# ============================================
+# LOOKAHEAD PIPELINE
+# ============================================
+
+class PreparedEmail:
+    """
+    Fetched and classified email, ready for operator review.
+
+    `spam_reason` is set when fetch_email decided SPAM from metadata
+    ("label", "reputation" or "keywords").
+    """
+    __slots__ = ("email", "category", "has_meeting", "spam_reason")
+
+    email: EmailRecord
+    category: str
+    has_meeting: bool
+    spam_reason: str
+
+    def __init__(self, email, category, has_meeting, spam_reason=None):
+        self.email = email
+        self.category = category
+        self.has_meeting = has_meeting
+        self.spam_reason = spam_reason
+
+
+class LookaheadPipeline:
+    """
+    Prepares upcoming emails in the background while the operator reviews
+    the current one.
+
+    Emails N+1..N+lookahead are fetched, classified and checked for
+    meetings on worker threads. Non-spam emails also get a speculative
+    reply draft generated with the last reply settings the operator chose;
+    a draft is only used if the operator picks the same settings again,
+    otherwise it is discarded. At most `max_speculative` drafts are
+    requested per run, only when Gemini is configured, and a draft that
+    fell back to a template is upgraded if Gemini answers before the
+    operator gets to it. Background drafts never print, so they cannot
+    interleave with prompts. Gmail calls are serialised through
+    `gmail_lock` because API client objects are not thread-safe.
+    """
+
+    def __init__(self, gmail_service, messages, lookahead=LOOKAHEAD,
+                 max_speculative=SPECULATIVE_REPLY_BUDGET, workers=4, prefilter=None):
+        self.gmail_service = gmail_service
+        self.messages = messages
+        self.prefilter = prefilter
+        self.lookahead = max(0, lookahead)
+        self.max_speculative = max(0, max_speculative)
+        self.gmail_lock = threading.Lock()
+        
+        self._executor = ThreadPoolExecutor(max_workers=workers) if self.lookahead else None
+        self._lock = threading.Lock()
+        self._prepared = {}  # index -> Future[PreparedEmail]
+        self._ready = {}  # index -> PreparedEmail, not yet handed out
+        self._drafts = {}  # index -> (settings, Future[reply], late Gemini replies)
+        self._settings = None  # last (recipient_type, formality, reply_context)
+        self._current = 0
+        
+        self.speculative_requested = 0
+        self.speculative_used = 0
+        self.speculative_discarded = 0
+
+    def _prepare(self, index):
+        with self.gmail_lock:
+            email, category, spam_reason = fetch_email(
+                self.gmail_service, self.messages[index]["id"], self.prefilter
+            )
+        if category is None:
+            category = classify_email(email.subject, email.body, email.sender)
+        if email.invite is not None:
+            has_meeting = not email.invite.cancelled  # a cancellation is not a meeting to add
+        else:
+            has_meeting = detect_meeting(email.subject, email.body)
+        prepared = PreparedEmail(email, category, has_meeting, spam_reason)
+        
+        with self._lock:
+            if index > self._current:
+                self._ready[index] = prepared
+            self._speculate(index, prepared)
+        return prepared
+
+    def _speculate(self, index, prepared):
+        """Queue a draft for `index` with the current settings (caller holds _lock)"""
+        if self._settings is None or prepared.category == "SPAM" or index <= self._current:
+            return
+        
+        existing = self._drafts.get(index)
+        if existing and existing[0] == self._settings:
+            return
+        if existing:
+            existing[1].cancel()
+            self.speculative_discarded += 1
+            del self._drafts[index]
+        
+        # Without Gemini a draft is just the template - not worth the budget
+        if self.speculative_requested >= self.max_speculative or not GEMINI_API_KEY:
+            return
+        
+        recipient_type, formality, reply_context = self._settings
+        upgraded = []
+        self.speculative_requested += 1
+        self._drafts[index] = (self._settings, self._executor.submit(
+            generate_reply_with_gemini, prepared.email, reply_context, recipient_type, formality,
+            on_upgrade=upgraded.append, quiet=True
+        ), upgraded)
+
+    def get(self, index):
+        """Return the PreparedEmail for `index`, blocking only if it is not ready yet"""
+        self._current = index
+        if not self._executor:
+            return self._prepare(index)
+        
+        last = min(index + self.lookahead, len(self.messages) - 1)
+        with self._lock:
+            for ahead in range(index, last + 1):
+                if ahead not in self._prepared:
+                    self._prepared[ahead] = self._executor.submit(self._prepare, ahead)
+            future = self._prepared.pop(index)
+            self._ready.pop(index, None)
+        return future.result()
+
+    def remember_settings(self, recipient_type, formality, reply_context):
+        """Record the operator's reply settings and re-draft queued emails to match"""
+        with self._lock:
+            self._settings = (recipient_type, formality, reply_context)
+            if not self._executor:
+                return
+            for index, prepared in sorted(self._ready.items()):
+                self._speculate(index, prepared)
+
+    def take_draft(self, index, recipient_type, formality, reply_context):
+        """Return the speculative reply for `index` if it matches these settings, else None"""
+        with self._lock:
+            entry = self._drafts.pop(index, None)
+        if entry is None:
+            return None
+        
+        settings, future, upgraded = entry
+        if settings != (recipient_type, formality, reply_context) or future.cancelled():
+            future.cancel()
+            with self._lock:
+                self.speculative_discarded += 1
+            return None
+        
+        try:
+            reply = future.result()
+        except Exception:
+            return None
+        with self._lock:
+            self.speculative_used += 1
+        # Prefer Gemini's answer if it arrived after the draft fell back to a template
+        return upgraded[0] if upgraded else reply
+
+    def close(self):
+        """Cancel outstanding background work"""
+        if not self._executor:
+            return
+        with self._lock:
+            for future in self._prepared.values():
+                future.cancel()
+            for _, future, _ in self._drafts.values():
+                future.cancel()
+                self.speculative_discarded += 1
+            self._prepared.clear()
+            self._ready.clear()
+            self._drafts.clear()
+        self._executor.shutdown(wait=False)
+
+
+# ============================================
+# RESULTS & SUMMARY
+# ============================================
+
+class ResultRecord:
+    """Outcome of processing one email"""
+    __slots__ = ("sender", "subject", "category", "has_meeting", "calendar_link")
+
+    sender: str
+    subject: str
+    category: str
+    has_meeting: bool
+    calendar_link: str
+
+    def __init__(self, sender, subject, category, has_meeting, calendar_link=None):
+        self.sender = sender
+        self.subject = subject
+        self.category = category
+        self.has_meeting = has_meeting
+        self.calendar_link = calendar_link
+
+
+class SummaryAggregator:
+    """
+    Streaming run statistics, updated as each email finishes.
+
+    Counts are kept as running totals and only the last `max_listed`
+    results are retained for the per-email listing, so memory stays
+    constant however many emails are processed.
+    """
+
+    def __init__(self, max_listed=50):
+        self.category_counts = {"PERSONAL": 0, "PROFESSIONAL": 0, "SPAM": 0}
+        self.meetings = 0
+        self.total = 0
+        self.recent = deque(maxlen=max_listed)
+
+    def add(self, result):
+        """Fold one ResultRecord into the running statistics"""
+        self.total += 1
+        self.category_counts[result.category] = self.category_counts.get(result.category, 0) + 1
+        if result.has_meeting:
+            self.meetings += 1
+        self.recent.append(result)
+
+    def print_summary(self):
+        """Print the per-email listing followed by the statistics"""
+        print("\n" + "=" * 70)
+        print("PROCESSING COMPLETE - SUMMARY")
+        print("=" * 70)
+        
+        omitted = self.total - len(self.recent)
+        if omitted:
+            print(f"\n... {omitted} earlier email(s) not listed")
+        
+        for idx, result in enumerate(self.recent, omitted + 1):
+            print(f"\n{idx}. {result.subject[:50]}...")
+            print(f"   Category: {result.category}")
+            if result.has_meeting:
+                print(f"   📅 Meeting: {'Added' if result.calendar_link else 'Not added'}")
+        
+        # Statistics
+        print("\n" + "-" * 70)
+        personal = self.category_counts["PERSONAL"]
+        professional = self.category_counts["PROFESSIONAL"]
+        spam = self.category_counts["SPAM"]
+        
+        print(f"Personal: {personal} | Professional: {professional} | Spam: {spam}")
+        print(f"Meetings detected: {self.meetings}")
+        print("=" * 70)
+
+
 # ============================================
 # MAIN WORKFLOW FUNCTIONS
 # ============================================
 
-def process_incoming_emails():
-    """Main function to process incoming emails"""
+def process_incoming_emails(gmail_service=None, calendar_service=None, ask=input, max_results=10,
+                            lookahead=LOOKAHEAD, max_speculative=SPECULATIVE_REPLY_BUDGET,
+                            prefilter=None):
+    """
+    Main function to process incoming emails
+
+    Services are authenticated on demand when not supplied, and every
+    operator prompt goes through `ask` (defaults to input()) so the
+    workflow can be driven non-interactively, e.g. by benchmark.py.
+    Upcoming emails are prepared in the background (see LookaheadPipeline).
+    `prefilter` defaults to PrefilterRules.from_config().
+    """
     
     print("=" * 70)
     print("AI EMAIL AUTOMATION - PROCESS INCOMING EMAILS")
     print("=" * 70)
     
     # Authenticate
-    print("\n[1] Authenticating with Google...")
-    gmail_service, calendar_service = authenticate_google()
-    print("✓ Authentication successful")
+    if gmail_service is None or calendar_service is None:
+        print("\n[1] Authenticating with Google...")
+        gmail_service, calendar_service = authenticate_google()
+        print("✓ Authentication successful")
     
     # Fetch unread emails
+    if prefilter is None:
+        prefilter = PrefilterRules.from_config()
+    query = prefilter.query()
+    
     print("\n[2] Fetching unread emails...")
-    messages = list_unread_emails(gmail_service, max_results=10)
+    if query != "is:unread":
+        print(f"   Filter: {query}")
+    messages = list_unread_emails(gmail_service, max_results=max_results, query=query)
     
     if not messages:
         print("No unread emails found.")
@@ -535,118 +1561,165 @@ def process_incoming_emails():
     print(f"✓ Found {len(messages)} unread email(s)")
     
     # Process each email
-    results = []
+    summary = SummaryAggregator()
+    pipeline = LookaheadPipeline(gmail_service, messages, lookahead, max_speculative,
+                                 prefilter=prefilter)
     
-    for idx, msg in enumerate(messages, 1):
-        print(f"\n{'=' * 70}")
-        print(f"Processing Email {idx}/{len(messages)}")
-        print(f"{'=' * 70}")
-        
-        # Get email details
-        email = get_email_details(gmail_service, msg["id"])
-        
-        print(f"\nFrom: {email['sender']}")
-        print(f"Subject: {email['subject']}")
-        print(f"Body Preview: {email['body'][:100]}...")
-        
-        # Classify email
-        category = classify_email(
-            email['subject'],
-            email['body'],
-            email['sender']
-        )
-        print(f"\n📧 Classification: {category}")
-        
-        # Detect meeting
-        has_meeting = detect_meeting(email['subject'], email['body'])
-        calendar_link = None
-        
-        if has_meeting:
+    try:
+        for idx in range(1, len(messages) + 1):
+            _review_email(
+                pipeline, idx, len(messages), calendar_service, gmail_service, ask, summary
+            )
+    finally:
+        pipeline.close()
+        if prefilter.reputation:
+            prefilter.reputation.save()
+    
+    # Summary
+    summary.print_summary()
+    if pipeline.speculative_requested:
+        print(f"⚡ Speculative drafts: {pipeline.speculative_used} used, "
+              f"{pipeline.speculative_discarded} discarded "
+              f"({pipeline.speculative_requested}/{pipeline.max_speculative} budget)")
+    if prefilter.excluded_bulk:
+        print(f"🚫 Known-bulk senders excluded: {prefilter.excluded_bulk} "
+              f"(rechecked {prefilter.reputation.recheck_days} days after last seen)")
+
+
+def _review_email(pipeline, idx, total, calendar_service, gmail_service, ask, summary):
+    """Interactive review of one email from the lookahead pipeline"""
+    print(f"\n{'=' * 70}")
+    print(f"Processing Email {idx}/{total}")
+    print(f"{'=' * 70}")
+    
+    # Get email details, classification and meeting check (prefetched)
+    prepared = pipeline.get(idx - 1)
+    email = prepared.email
+    category = prepared.category
+    has_meeting = prepared.has_meeting
+    
+    print(f"\nFrom: {email.sender}")
+    print(f"Subject: {email.subject}")
+    print(f"Body Preview: {email.body[:100]}...")
+    print(f"\n📧 Classification: {category}")
+    
+    calendar_link = None
+    
+    if email.invite and email.invite.cancelled:
+        print(f"\n🚫 Meeting cancelled: {email.invite.summary or email.subject}")
+    
+    if has_meeting:
+        invite = email.invite
+        if invite:
+            print(f"\n📅 Calendar invite: {invite.summary or email.subject}")
+            if isinstance(invite.start, datetime):
+                print(f"   Time: {invite.start.strftime('%Y-%m-%d %H:%M')} - "
+                      f"{invite.end.strftime('%H:%M')} ({invite.timezone})")
+            else:
+                print(f"   Date: {invite.start.isoformat()} (all day)")
+        else:
             print("\n📅 Meeting detected!")
-            meeting_time = extract_meeting_time(email['body'])
+            meeting_time = extract_meeting_time(email.body)
             print(f"   Suggested time: {meeting_time.strftime('%Y-%m-%d %H:%M')}")
-            
-            confirm = input("   Add to calendar? (yes/no): ").lower()
-            
-            if confirm == 'yes':
+        
+        confirm = ask("   Add to calendar? (yes/no): ").lower()
+        
+        if confirm == 'yes':
+            if invite:
                 calendar_link = add_to_calendar(
                     calendar_service,
-                    email['subject'],
-                    email['sender'],
+                    invite.summary or email.subject,
+                    invite.organizer or email.sender,
+                    invite.start,
+                    end_time=invite.end,
+                    timezone=invite.timezone,
+                    uid=invite.uid or None,
+                    sequence=invite.sequence
+                )
+            else:
+                calendar_link = add_to_calendar(
+                    calendar_service,
+                    email.subject,
+                    email.sender,
                     meeting_time
                 )
-                print(f"   ✓ Meeting added to calendar")
+            print(f"   ✓ Meeting added to calendar")
+    
+    # Generate reply (skip spam)
+    if category != "SPAM":
+        reply_offer = ask("\n   Generate AI reply? (yes/no): ").lower()
         
-        # Generate reply (skip spam)
-        if category != "SPAM":
-            reply_offer = input("\n   Generate AI reply? (yes/no): ").lower()
+        if reply_offer == 'yes':
+            print("\n   Recipient types:")
+            print("   1. friend  2. colleague  3. client  4. boss  5. relative")
+            
+            recipient_type = ask("   Select (1-5): ")
+            type_map = {"1": "friend", "2": "colleague", "3": "client", "4": "boss", "5": "relative"}
+            recipient_type = type_map.get(recipient_type, "colleague")
             
-            if reply_offer == 'yes':
-                print("\n   Recipient types:")
-                print("   1. friend  2. colleague  3. client  4. boss  5. relative")
-                
-                recipient_type = input("   Select (1-5): ")
-                type_map = {"1": "friend", "2": "colleague", "3": "client", "4": "boss", "5": "relative"}
-                recipient_type = type_map.get(recipient_type, "colleague")
-                
-                formality = float(input("   Formality (0.0=casual, 1.0=formal): "))
-                reply_context = input("   What should the reply say?: ")
-                
+            formality = float(ask("   Formality (0.0=casual, 1.0=formal): "))
+            reply_context = ask("   What should the reply say?: ")
+            
+            pipeline.remember_settings(recipient_type, formality, reply_context)
+            reply = pipeline.take_draft(idx - 1, recipient_type, formality, reply_context)
+            upgraded = []
+            
+            if reply:
+                print("\n   ⚡ Using reply drafted in the background")
+            else:
                 print("\n   ⏳ Generating reply with Gemini...")
-                reply = generate_reply_with_gemini(email, reply_context, recipient_type, formality)
-                
-                print("\n   " + "─" * 60)
-                print("   GENERATED REPLY:")
-                print("   " + "─" * 60)
+                reply = generate_reply_with_gemini(
+                    email, reply_context, recipient_type, formality, on_upgrade=upgraded.append
+                )
+            
+            print("\n   " + "─" * 60)
+            print("   GENERATED REPLY:")
+            print("   " + "─" * 60)
+            print(f"\n{reply['full_text']}\n")
+            print("   " + "─" * 60)
+            
+            # A late Gemini answer replaces the template before approval
+            if upgraded:
+                reply = upgraded[0]
+                print("\n   ⚡ Gemini reply arrived - updated draft:")
                 print(f"\n{reply['full_text']}\n")
                 print("   " + "─" * 60)
-                
-                send_confirm = input("\n   Send this reply? (yes/no): ").lower()
-                
-                if send_confirm == 'yes':
-                    sender_email = re.search(r'<(.+?)>', email['sender'])
-                    if sender_email:
-                        sender_email = sender_email.group(1)
-                    else:
-                        sender_email = email['sender']
-                    
-                    msg = create_email_message(
-                        sender_email,
-                        f"Re: {email['subject']}",
-                        reply['full_text']
-                    )
+            
+            send_confirm = ask("\n   Send this reply? (yes/no): ").lower()
+            
+            # Gemini may also answer while the operator is at the prompt;
+            # never send a draft that has not been shown
+            if upgraded and reply is not upgraded[0]:
+                print("\n   ⚡ Gemini reply arrived:")
+                print(f"\n{upgraded[0]['full_text']}\n")
+                print("   " + "─" * 60)
+                if ask("\n   Send the Gemini reply instead? (yes/no): ").lower() == 'yes':
+                    reply = upgraded[0]
+                    send_confirm = 'yes'
+            
+            if send_confirm == 'yes':
+                msg = create_email_message(
+                    sender_address(email.sender),
+                    f"Re: {email.subject}",
+                    reply['full_text']
+                )
+                with pipeline.gmail_lock:
                     send_email(gmail_service, msg)
-                    print("   ✓ Reply sent!")
-        
-        results.append({
-            'sender': email['sender'],
-            'subject': email['subject'],
-            'category': category,
-            'has_meeting': has_meeting,
-            'calendar_link': calendar_link
-        })
-    
-    # Summary
-    print("\n" + "=" * 70)
-    print("PROCESSING COMPLETE - SUMMARY")
-    print("=" * 70)
-    
-    for idx, result in enumerate(results, 1):
-        print(f"\n{idx}. {result['subject'][:50]}...")
-        print(f"   Category: {result['category']}")
-        if result['has_meeting']:
-            print(f"   📅 Meeting: {'Added' if result['calendar_link'] else 'Not added'}")
-    
-    # Statistics
-    print("\n" + "-" * 70)
-    personal = sum(1 for r in results if r['category'] == 'PERSONAL')
-    professional = sum(1 for r in results if r['category'] == 'PROFESSIONAL')
-    spam = sum(1 for r in results if r['category'] == 'SPAM')
-    meetings = sum(1 for r in results if r['has_meeting'])
-    
-    print(f"Personal: {personal} | Professional: {professional} | Spam: {spam}")
-    print(f"Meetings detected: {meetings}")
-    print("=" * 70)
+                print("   ✓ Reply sent!")
+    
+    # A SPAM verdict taken from the reputation is not new evidence; counting
+    # it would keep refreshing the sender and its verdict would never expire
+    if pipeline.prefilter and pipeline.prefilter.reputation \
+            and prepared.spam_reason != "reputation":
+        pipeline.prefilter.reputation.record(email.sender, category)
+    
+    summary.add(ResultRecord(
+        sender=email.sender,
+        subject=email.subject,
+        category=category,
+        has_meeting=has_meeting,
+        calendar_link=calendar_link
+    ))
 
 
 def compose_new_email_workflow():